@@ -6,31 +6,327 @@ Kullanım:
     python analyze_with_ai.py scan-www.lcw.com.json
     python analyze_with_ai.py scan-www.lcw.com.json --model gpt-4o
     python analyze_with_ai.py scan-www.lcw.com.json --vision-only  # Sadece görsel analiz
+    python analyze_with_ai.py scan-www.lcw.com.json --concurrency 4  # Eşzamanlı AI isteği
+    python analyze_with_ai.py scan-www.lcw.com.json --batch  # Endpoint analizi Batch API ile (%50 ucuz)
+    python analyze_with_ai.py scan-www.lcw.com.json --poll batch_abc123  # Batch sonucunu al
+    python analyze_with_ai.py scan-www.lcw.com.json --no-cache  # .ai_cache'i kullanma
 """
 
-import json
+import asyncio
+import base64
+import functools
+import argparse
+import hashlib
 import sys
 import os
-from openai import OpenAI
-from typing import List, Dict
+import time
+import tempfile
+import orjson
+from itertools import chain, islice
+from operator import itemgetter
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Dict, Iterable, Iterator, Optional
 from dotenv import load_dotenv
 
+# openai/httpx/tenacity/diskcache/ijson/blake3: sadece kullanıldıkları fonksiyon
+# içinde yüklenir (--help ve hatalı argümanlar bu maliyeti ödemez)
+if TYPE_CHECKING:
+    import httpx
+    from diskcache import Cache
+    from openai import AsyncOpenAI
+
 # .env dosyasından API key'i yükle
 load_dotenv()
 
+# Aynı girdiler için AI yanıt cache'i (--no-cache ile kapatılır)
+CACHE_DIR = ".ai_cache"
+_ai_cache: Optional['Cache'] = None
+
+def enable_disk_cache(directory: str = CACHE_DIR):
+    """AI yanıt cache'ini aç"""
+    from diskcache import Cache
+    
+    global _ai_cache
+    _ai_cache = Cache(directory)
+
+def _cache_key(request_body: Dict) -> str:
+    """
+    BLAKE2b(istek gövdesi) - model, prompt'lar, şema, temperature, max_tokens
+    ve girdi anahtara dahil; prompt/şema değişince eski yanıtlar kullanılmaz
+    """
+    return hashlib.blake2b(orjson.dumps(request_body, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def disk_cache(key_func):
+    """
+    AI çağrısının sonucunu diskte sakla (tekrar çalıştırmada token ödenmez)
+    
+    key_func çağrı argümanlarından cache anahtarı üretir. Sarmalanan fonksiyon
+    (response_json, usage_tokens) döndürür ve bu ikili olduğu gibi saklanır.
+    Hata fırlatan çağrılar cache'lenmez. Cache kapalıysa doğrudan çağrılır.
+    Sadece async fonksiyonlar için (tüm AI çağrıları AsyncOpenAI ile yapılır).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _ai_cache is None:
+                return await func(*args, **kwargs)
+            key = key_func(*args, **kwargs)
+            cached = _ai_cache.get(key)
+            if cached is not None:
+                print("    ♻️  Cache'ten alındı")
+                return cached
+            value = await func(*args, **kwargs)
+            _ai_cache.set(key, value)
+            return value
+        return wrapper
+    return decorator
+
 def load_scan_results(json_file):
     """Scan sonuçlarını yükle"""
-    with open(json_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return orjson.loads(Path(json_file).read_bytes())
+
+def _import_ijson():
+    """ijson modülü (C backend varsa o, ~5x daha hızlı)"""
+    try:
+        import ijson.backends.yajl2_c as ijson
+    except ImportError:
+        import ijson
+    return ijson
+
+def _iter_json_items(json_file, prefix: str) -> Iterator[Dict]:
+    """JSON dosyasında prefix altındaki kayıtları tek tek oku (dosyanın tamamı belleğe alınmaz)"""
+    ijson = _import_ijson()
+    with open(json_file, 'rb') as f:
+        yield from ijson.items(f, prefix, use_float=True)
+
+def load_scan_results_streaming(json_file) -> Dict:
+    """
+    Scan sonuçlarını streaming olarak yükle
+    
+    Büyük taramalarda (binlerce endpoint + base64 screenshot) bellek kullanımı
+    dosya boyutu yerine tek kayıt boyutunda kalır. ijson kurulu değilse
+    dosya load_scan_results ile tek seferde okunur (aynı anahtarlar, list).
+    
+    Returns:
+        {
+            "statistics": dict,
+            "endpoints": Iterator[dict],    # /endpoints/* (ayrı okuma)
+            "screenshots": Iterator[dict]   # /screenshots/* (ayrı okuma)
+        }
+    """
+    try:
+        ijson = _import_ijson()
+    except ImportError:
+        print("ℹ️  ijson bulunamadı - scan dosyası tek seferde okunuyor")
+        return load_scan_results(json_file)
+    
+    with open(json_file, 'rb') as f:
+        statistics = dict(ijson.kvitems(f, 'statistics', use_float=True))
+    
+    return {
+        'statistics': statistics,
+        'endpoints': _iter_json_items(json_file, 'endpoints.item'),
+        'screenshots': _iter_json_items(json_file, 'screenshots.item'),
+    }
+
+def _peek(items: Iterable) -> Optional[Iterator]:
+    """Boşsa None, değilse ilk elemanı geri eklenmiş iterator döndür"""
+    items = iter(items)
+    first = next(items, None)
+    if first is None:
+        return None
+    return chain([first], items)
+
+# Tek istekte analiz edilecek endpoint sayısı (chunk'lar paralel gönderilir)
+ENDPOINT_CHUNK_SIZE = 30
+
+# Structured Output için JSON Schema (strict mode: tüm alanlar required,
+# her object seviyesinde additionalProperties=False olmalı)
+ENDPOINT_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "analysis": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "endpoint": {"type": "string"},
+                    "risk_detected": {"type": "boolean"},
+                    "risk_level": {
+                        "type": "string",
+                        "enum": ["Critical", "High", "Medium", "Low", "Info"]
+                    },
+                    "risk_type": {
+                        "type": "string",
+                        "enum": ["IDOR", "BOLA", "SSRF", "Mass Assignment", "Information Disclosure", "Admin Access", "None"]
+                    },
+                    "reasoning": {"type": "string"},
+                    "cvss_score": {"type": "number"}
+                },
+                "required": ["endpoint", "risk_detected", "risk_level", "risk_type", "reasoning", "cvss_score"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["analysis"],
+    "additionalProperties": False
+}
+
+# Sabit system prompt (talimat + taksonomi + şema + örnekler)
+# OpenAI prefix cache >=1024 token'lık aynı prefix'i cache'ler; bu metin o sınırın
+# üzerinde tutulur ve çağrılar arasında DEĞİŞMEMELİDİR.
+ENDPOINT_SYSTEM_PROMPT = """Sen bir API güvenlik uzmanısın. Görevin, bir web uygulamasının taranması sırasında keşfedilen API endpoint'lerini güvenlik açısından değerlendirmek.
 
-def analyze_endpoints_with_ai(endpoints: List[Dict], api_key: str, model: str = "gpt-3.5-turbo") -> Dict:
+GİRDİ:
+Kullanıcı mesajı SADECE bir JSON dizisidir. Her eleman bir endpoint'tir:
+- method: HTTP metodu (GET, POST, PUT, PATCH, DELETE, ...)
+- url: Parametrelenmiş path (ör: /api/users/{userId}/orders)
+- parameters: Query parametre adları (alfabetik sıralı)
+
+ÇIKTI:
+SADECE geçerli JSON üret. Markdown, açıklama veya başka text YASAK.
+Girdideki HER endpoint için "analysis" dizisine bir kayıt ekle ve girdi sırasını koru.
+"endpoint" alanı "<METHOD> <url>" biçiminde olmalı (ör: "GET /api/users/{userId}").
+
+Her endpoint için tespit et (risk_type):
+1. IDOR - userId/orderId gibi doğrudan nesne referansları (path veya query). Başka kullanıcının kaydına erişim denenebilir.
+2. BOLA - Yetkilendirme zafiyeti; özellikle PUT/PATCH/DELETE ile başkasına ait kaynağı değiştiren endpoint'ler.
+3. SSRF - URL parametresi (url, uri, callback, redirect, webhook, target, dest, feed). Sunucu tarafında istek tetiklenebilir.
+4. Mass Assignment - Çok parametre alan yazma endpoint'leri; role, isAdmin, price, status gibi alanlar dışarıdan set edilebilir.
+5. Information Disclosure - Hassas veri; debug, config, env, health, metrics, swagger, graphql, export, backup, logs gibi yollar.
+6. Admin Access - /admin, /internal, /manage, /staff, /console, /dashboard gibi yönetim path'leri.
+7. None - Belirgin bir risk yok.
+
+RİSK SEVİYESİ (risk_level) ve CVSS:
+- Critical: Kimlik doğrulamasız veri değiştirme/silme veya doğrudan yönetim erişimi (cvss_score 9.0-10.0)
+- High: Başka kullanıcının verisine erişim, SSRF, toplu veri sızıntısı (cvss_score 7.0-8.9)
+- Medium: Sınırlı veri sızıntısı, yetki kontrolü şüphesi, Mass Assignment ihtimali (cvss_score 4.0-6.9)
+- Low: Düşük etkili bilgi açığa çıkması, versiyon/teknoloji ifşası (cvss_score 0.1-3.9)
+- Info: Risk yok, sadece bilgi amaçlı (cvss_score 0.0)
+
+KURALLAR:
+- risk_detected=true ise mutlaka reasoning açıkla: hangi parametre veya path parçası, neden riskli, nasıl test edilir.
+- risk_detected=false ise risk_type "None", risk_level "Info" ve cvss_score 0.0 olmalı.
+- cvss_score 0.0-10.0 aralığında olmalı ve risk_level ile uyumlu olmalı.
+- Sadece method, path ve parametre adlarından çıkarılabilecek sonuçları yaz; uydurma bilgi ekleme.
+- Statik dosyalar, analytics/telemetry/tracking çağrıları ve herkese açık listeleme endpoint'leri genelde "None"dır.
+- Aynı endpoint birden fazla risk taşıyorsa en yüksek etkili olanı seç, diğerlerini reasoning içinde belirt.
+- reasoning kısa ve somut olsun (1-3 cümle), Türkçe yaz.
+
+JSON ŞEMASI:
+%s
+
+ÖRNEK 1
+Girdi:
+[{"method": "DELETE", "parameters": [], "url": "/api/users/{userId}"}, {"method": "GET", "parameters": ["lang", "page"], "url": "/api/products"}]
+Çıktı:
+{"analysis": [{"endpoint": "DELETE /api/users/{userId}", "risk_detected": true, "risk_level": "Critical", "risk_type": "IDOR", "reasoning": "userId path parametresi ile başka kullanıcıların hesabı silinebilir. Farklı bir kullanıcının oturumuyla aynı userId denenerek sahiplik kontrolü test edilmeli.", "cvss_score": 9.1}, {"endpoint": "GET /api/products", "risk_detected": false, "risk_level": "Info", "risk_type": "None", "reasoning": "Herkese açık ürün listesi; lang ve page parametreleri hassas veri veya nesne referansı taşımıyor.", "cvss_score": 0.0}]}
+
+ÖRNEK 2
+Girdi:
+[{"method": "GET", "parameters": ["url"], "url": "/api/preview"}, {"method": "GET", "parameters": [], "url": "/admin/config"}, {"method": "PATCH", "parameters": [], "url": "/api/orders/{orderId}"}]
+Çıktı:
+{"analysis": [{"endpoint": "GET /api/preview", "risk_detected": true, "risk_level": "High", "risk_type": "SSRF", "reasoning": "url parametresi sunucunun dış kaynak çekmesine yol açıyor olabilir. http://169.254.169.254/ gibi iç adreslerle SSRF denenmeli.", "cvss_score": 8.2}, {"endpoint": "GET /admin/config", "risk_detected": true, "risk_level": "Critical", "risk_type": "Admin Access", "reasoning": "/admin altındaki config endpoint'i yönetim arayüzünü ve yapılandırma verisini açığa çıkarabilir. Yetkisiz kullanıcı ile erişim denenmeli.", "cvss_score": 9.0}, {"endpoint": "PATCH /api/orders/{orderId}", "risk_detected": true, "risk_level": "High", "risk_type": "BOLA", "reasoning": "orderId ile başka kullanıcının siparişi güncellenebilir; gövdede status/price gibi alanlar Mass Assignment için de test edilmeli.", "cvss_score": 8.1}]}""" % orjson.dumps(ENDPOINT_RESPONSE_SCHEMA, option=orjson.OPT_INDENT_2).decode()
+
+def _retrying():
+    """
+    Geçici OpenAI hataları için exponential backoff + jitter ile tekrar deneme döngüsü
+    
+    Endpoint ve Vision çağrıları bunu kullanır: 429 (RateLimitError), 5xx
+    (InternalServerError), bağlantı kopması ve timeout tüm çalışmayı düşürmez.
+    SDK'nın kendi retry'ı kapalıdır (max_retries=0) → denemeler katlanmaz.
+    """
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+    from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+    
+    return AsyncRetrying(
+        wait=wait_exponential_jitter(initial=1, max=30),
+        retry=retry_if_exception_type((RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)),
+        stop=stop_after_attempt(6),
+        reraise=True
+    )
+
+def _summarize_endpoints(endpoints: Iterable[Dict]) -> List[Dict]:
+    """
+    Endpoint kayıtlarını AI'a gönderilecek kısa forma indir
+    
+    (method, url_template, parametre kümesi) aynı olan kayıtlar tek sayılır;
+    böylece istekler tekrar eden kayıtlarla değil benzersiz endpoint'lerle dolar.
+    Parametreler ve liste (method, url, parametreler) sırasına göre sıralanır →
+    crawler sırası değişse de aynı site her çalıştırmada aynı chunk'ları ve
+    byte-byte aynı prompt'u üretir (prefix cache + disk cache isabeti).
+    """
+    seen = {
+        (ep['method'], ep['url_template'], frozenset(p['name'] for p in ep.get('parameters', [])))
+        for ep in endpoints
+    }
+    
+    summary = [
+        {'method': method, 'url': url, 'parameters': sorted(params)}
+        for method, url, params in seen
+    ]
+    summary.sort(key=itemgetter('method', 'url', 'parameters'))
+    return summary
+
+def _endpoint_request_body(endpoint_summary: List[Dict], model: str) -> Dict:
+    """
+    Endpoint analizi için chat.completions parametreleri
+    
+    Senkron çağrı ve Batch API aynı gövdeyi kullanır. Uzun ve sabit kısım
+    (ENDPOINT_SYSTEM_PROMPT) her çağrıda byte-byte aynı prefix'tir; değişken
+    endpoint listesi sadece son user mesajında yer alır → OpenAI prefix cache.
+    """
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": ENDPOINT_SYSTEM_PROMPT},
+            {"role": "user", "content": orjson.dumps(endpoint_summary, option=orjson.OPT_SORT_KEYS).decode()}
+        ],
+        "response_format": {  # STRUCTURED OUTPUT GUARANTEE (şemaya birebir uyar)
+            "type": "json_schema",
+            "json_schema": {"name": "endpoint_risk_analysis", "strict": True, "schema": ENDPOINT_RESPONSE_SCHEMA}
+        },
+        "temperature": 0.1,  # Daha deterministik (0.3'ten düşük)
+        # Çıktı endpoint başına ~60 token; worst-case 4000 yerine chunk'a göre
+        # sıkı sınır → TPM rezervasyonu küçük, daha az 429
+        "max_tokens": min(4096, len(endpoint_summary) * 80 + 256)
+    }
+
+@disk_cache(lambda client, sem, endpoint_summary, model: _cache_key(
+    _endpoint_request_body(endpoint_summary, model)))
+async def _request_endpoint_analysis(client: 'AsyncOpenAI', sem: asyncio.Semaphore,
+                                     endpoint_summary: List[Dict], model: str):
+    """Tek chunk için endpoint analizi isteği → (analysis, usage_tokens)"""
+    async for attempt in _retrying():
+        with attempt:
+            async with sem:
+                response = await client.chat.completions.create(**_endpoint_request_body(endpoint_summary, model))
+    
+    # DOĞRUDAN JSON.LOADS (regex/parsing YOK!)
+    ai_response = response.choices[0].message.content
+    usage_tokens = 0
+    if response.usage:
+        usage_tokens = response.usage.total_tokens
+        details = response.usage.prompt_tokens_details
+        cached_tokens = (details.cached_tokens or 0) if details else 0
+        print(f"   Prefix cache: {cached_tokens}/{response.usage.prompt_tokens} prompt token")
+    return orjson.loads(ai_response), usage_tokens
+
+async def analyze_endpoints_with_ai(endpoints: Iterable[Dict], api_key: str, model: str = "gpt-4o-mini",
+                                    concurrency: int = 8, chunk_size: int = ENDPOINT_CHUNK_SIZE,
+                                    http_client: Optional['httpx.AsyncClient'] = None) -> Dict:
     """
     OpenAI Structured Outputs ile endpoint güvenlik analizi
     
     STRUCTURED OUTPUT GUARANTEE:
-    - response_format ile JSON garantisi
+    - response_format=json_schema (strict) ile şema garantisi
     - Regex/string parsing YOK
-    - Doğrudan json.loads() çalışır
+    - Doğrudan orjson.loads() çalışır
+    
+    TAM KAPSAM:
+    - Endpoint'ler kesilmez; chunk_size'lık parçalara bölünür
+    - Parçalar AsyncOpenAI + asyncio.gather ile paralel gönderilir (Semaphore ile sınırlı)
+    - 429/5xx/bağlantı hataları exponential backoff + jitter ile tekrar denenir
     
     Returns:
         {
@@ -40,162 +336,202 @@ def analyze_endpoints_with_ai(endpoints: List[Dict], api_key: str, model: str =
                     "risk_level": str,  # Critical/High/Medium/Low/Info
                     "risk_type": str,   # IDOR/BOLA/SSRF/etc
                     "reasoning": str,
-                    "endpoint": str
+                    "endpoint": str,
+                    "cvss_score": float
                 }
             ]
         }
     """
     
-    client = OpenAI(api_key=api_key)
+    # Endpoint listesini hazırla (benzersiz) ve parçala
+    endpoint_summary = _summarize_endpoints(endpoints)
+    chunks = [endpoint_summary[i:i + chunk_size] for i in range(0, len(endpoint_summary), chunk_size)]
     
-    # Endpoint listesini hazırla (ilk 50)
-    endpoint_summary = []
-    for ep in endpoints[:50]:
-        endpoint_summary.append({
-            'method': ep['method'],
-            'url': ep['url_template'],
-            'parameters': [p['name'] for p in ep.get('parameters', [])]
-        })
-    
-    # Structured Output için JSON Schema
-    response_schema = {
-        "type": "object",
-        "properties": {
-            "analysis": {
-                "type": "array",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "endpoint": {"type": "string"},
-                        "risk_detected": {"type": "boolean"},
-                        "risk_level": {
-                            "type": "string",
-                            "enum": ["Critical", "High", "Medium", "Low", "Info"]
-                        },
-                        "risk_type": {
-                            "type": "string",
-                            "enum": ["IDOR", "BOLA", "SSRF", "Mass Assignment", "Information Disclosure", "Admin Access", "None"]
-                        },
-                        "reasoning": {"type": "string"},
-                        "cvss_score": {"type": "number"}
-                    },
-                    "required": ["endpoint", "risk_detected", "risk_level", "risk_type", "reasoning"]
-                }
-            }
-        },
-        "required": ["analysis"]
-    }
+    print("🤖 Endpoint Analizi (Structured Output)...")
+    print(f"📊 {len(endpoint_summary)} endpoint → {len(chunks)} istek")
+    print(f"🔧 Model: {model} (eşzamanlı: {concurrency})\n")
     
-    # AI prompt
-    prompt = f"""Sen bir API güvenlik uzmanısın. Aşağıdaki endpoint'leri analiz et:
-
-{json.dumps(endpoint_summary, indent=2)}
-
-Her endpoint için tespit et:
-1. IDOR - userId/orderId parametreleri
-2. BOLA - Yetkilendirme zafiyeti
-3. SSRF - URL parametresi
-4. Mass Assignment - Çok parametre
-5. Information Disclosure - Hassas veri
-6. Admin Access - /admin path'leri
+    sem = asyncio.Semaphore(concurrency)
+    from openai import AsyncOpenAI
+    
+    client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)  # retry: _retrying()
+    
+    tasks = [_request_endpoint_analysis(client, sem, chunk, model) for chunk in chunks]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    analysis = []
+    usage_tokens = 0
+    errors = []
+    
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"❌ AI analizi hatası: {result}")
+            errors.append(str(result))
+        else:
+            chunk_analysis, chunk_tokens = result
+            analysis.extend(chunk_analysis.get('analysis', []))
+            usage_tokens += chunk_tokens
+    
+    if errors and not analysis:
+        return {"error": errors[0], "analysis": []}
+    
+    if errors:
+        print(f"⚠️  {len(errors)}/{len(chunks)} istek başarısız")
+    print(f"✅ Analiz tamamlandı: {len(analysis)} endpoint değerlendirildi ({usage_tokens} token)\n")
+    return {"analysis": analysis}
 
-risk_detected=true ise mutlaka reasoning açıkla."""
+def submit_endpoints_batch(endpoints: Iterable[Dict], api_key: str, model: str = "gpt-4o-mini",
+                           prefix: str = "endpoints", chunk_size: int = 20) -> Dict:
+    """
+    Endpoint analizini OpenAI Batch API'ye gönder
     
-    print("🤖 Endpoint Analizi (Structured Output)...")
-    print(f"📊 {len(endpoint_summary)} endpoint")
+    BATCH MODE:
+    - %50 daha ucuz, çok daha yüksek rate limit
+    - Sonuç 24 saate kadar gecikebilir (--poll ile alınır)
+    - Endpoint'ler chunk_size'lık gruplara bölünür, her grup bir JSONL satırı
+    
+    Returns:
+        {"batch_id": str, "status": str} (poll_endpoints_batch ile sonucu almak için)
+        veya hata olursa {"error": str, "analysis": []}
+    """
+    
+    from openai import OpenAI, OpenAIError
+    
+    client = OpenAI(api_key=api_key)
+    
+    endpoint_summary = _summarize_endpoints(endpoints)
+    chunks = [endpoint_summary[i:i + chunk_size] for i in range(0, len(endpoint_summary), chunk_size)]
+    
+    print("📦 Endpoint Analizi (Batch API)...")
+    print(f"📊 {len(endpoint_summary)} endpoint → {len(chunks)} istek")
     print(f"🔧 Model: {model}\n")
     
+    # JSONL dosyası: her satır bir /v1/chat/completions isteği
+    with tempfile.NamedTemporaryFile('wb', suffix='.jsonl', delete=False) as f:
+        for idx, chunk in enumerate(chunks):
+            f.write(orjson.dumps({
+                "custom_id": f"{prefix}_{idx}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": _endpoint_request_body(chunk, model)
+            }) + b"\n")
+        batch_file = f.name
+    
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "Sen bir API güvenlik uzmanısın. SADECE geçerli JSON üret. Markdown, açıklama veya başka text YASAK."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},  # STRUCTURED OUTPUT GUARANTEE
-            temperature=0.1,  # Daha deterministik (0.3'ten düşük)
-            max_tokens=4000  # Daha fazla endpoint için
-        )
-        
-        # DOĞRUDAN JSON.LOADS (regex/parsing YOK!)
-        ai_response = response.choices[0].message.content
-        analysis = json.loads(ai_response)
+        with open(batch_file, 'rb') as f:
+            input_file = client.files.create(file=f, purpose="batch")
         
-        print(f"✅ Analiz tamamlandı: {len(analysis.get('analysis', []))} endpoint değerlendirildi\n")
-        return analysis
-        
-    except json.JSONDecodeError as e:
-        print(f"❌ JSON parse hatası: {e}")
-        return {"error": "JSON decode failed", "analysis": []}
-    except Exception as e:
-        print(f"❌ AI analizi hatası: {e}")
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+    except (OpenAIError, OSError) as e:
+        print(f"❌ Batch gönderilemedi: {e}")
         return {"error": str(e), "analysis": []}
+    finally:
+        os.remove(batch_file)
+    
+    print(f"✅ Batch gönderildi: {batch.id} (durum: {batch.status})\n")
+    return {"batch_id": batch.id, "status": batch.status}
+
+def _batch_row_error(row: Dict) -> str:
+    """Batch error dosyası satırından hata mesajı (istek hatası veya HTTP hata gövdesi)"""
+    error = row.get('error') or ((row.get('response') or {}).get('body') or {}).get('error') or {}
+    return error.get('message') or str(error) or 'unknown error'
 
-def analyze_screenshots_with_vision(screenshots: List[Dict], api_key: str, model: str = "gpt-4o") -> Dict:
+
+def poll_endpoints_batch(batch_id: str, api_key: str, max_interval: float = 300) -> Dict:
     """
-    OpenAI Vision API ile ekran görüntülerini analiz et
-    
-    GÖRSEL HATA TESPİTİ:
-    - Stack traces (kod hataları)
-    - Debug mode mesajları
-    - Admin panelleri
-    - Hassas bilgi sızıntısı
-    
-    STRUCTURED OUTPUT ile JSON garantisi
-    
-    Args:
-        screenshots: [{"url": str, "base64_image": str, ...}]
-        api_key: OpenAI API key
-        model: gpt-4o veya gpt-4o-mini (vision destekli)
+    Batch tamamlanana kadar bekle (exponential backoff) ve sonuçları birleştir
     
     Returns:
-        {
-            "visual_analysis": [
-                {
-                    "url": str,
-                    "issues_found": bool,
-                    "description": str,
-                    "severity": str  # Critical/High/Medium/Low/Info
-                }
-            ]
-        }
+        analyze_endpoints_with_ai ile aynı format: {"analysis": [...]}
     """
     
-    if not screenshots:
-        print("ℹ️  Screenshot bulunamadı - Vision analizi atlanıyor")
-        return {"visual_analysis": []}
+    from openai import OpenAI, OpenAIError
     
     client = OpenAI(api_key=api_key)
     
-    print(f"👁️  Vision Analizi Başlatılıyor...")
-    print(f"📸 {len(screenshots)} screenshot analiz edilecek")
-    print(f"🔧 Model: {model}\n")
+    print(f"⏳ Batch bekleniyor: {batch_id}")
     
-    all_results = []
-    
-    for idx, screenshot in enumerate(screenshots[:10], 1):  # İlk 10 screenshot (maliyet kontrolü)
-        url = screenshot.get('url', 'unknown')
-        base64_image = screenshot.get('base64_image', '')
-        
-        if not base64_image:
-            continue
+    interval = 5
+    try:
+        while True:
+            batch = client.batches.retrieve(batch_id)
+            if batch.status in ('completed', 'failed', 'expired', 'cancelled'):
+                break
+            print(f"   Durum: {batch.status} - {interval:.0f}s sonra tekrar kontrol edilecek")
+            time.sleep(interval)
+            interval = min(interval * 2, max_interval)
         
-        print(f"  [{idx}/{min(len(screenshots), 10)}] Analiz ediliyor: {url[:60]}...")
+        # İstek bazlı hatalar ayrı dosyada (output_file_id'de yer almaz)
+        error_rows = []
+        if batch.error_file_id:
+            error_content = client.files.content(batch.error_file_id).text
+            error_rows = [orjson.loads(line) for line in error_content.splitlines() if line.strip()]
         
+        content = client.files.content(batch.output_file_id).text if batch.output_file_id else ''
+    except OpenAIError as e:
+        print(f"❌ Batch sonucu alınamadı: {e}")
+        return {"error": str(e), "analysis": []}
+    
+    if error_rows:
+        print(f"⚠️  {len(error_rows)} batch isteği hata döndü (ilki: {_batch_row_error(error_rows[0])})")
+    
+    if batch.status != 'completed' or not batch.output_file_id:
+        # Batch seviyesindeki hata (ör. geçersiz JSONL) batch.errors içinde
+        reason = batch.status
+        if batch.errors and batch.errors.data:
+            reason = f"{batch.status}: {batch.errors.data[0].message}"
+        elif error_rows:
+            reason = f"{batch.status}: {_batch_row_error(error_rows[0])}"
+        print(f"❌ Batch tamamlanamadı: {reason}")
+        return {"error": f"Batch {reason}", "analysis": []}
+    
+    # Satırları custom_id sırasına göre birleştir
+    rows = [orjson.loads(line) for line in content.splitlines() if line.strip()]
+    rows.sort(key=lambda row: int(row['custom_id'].rsplit('_', 1)[-1]))
+    
+    analysis = []
+    failed = 0
+    for row in rows:
         try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Sen bir güvenlik uzmanısın. Web sayfası görüntülerinde güvenlik açıklarını tespit ediyorsun."
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": """Sen bir penetrasyon testçisisin. Bu görüntüde EXPLOIT potansiyeli ara.
+            ai_response = row['response']['body']['choices'][0]['message']['content']
+            analysis.extend(orjson.loads(ai_response).get('analysis', []))
+        except (KeyError, IndexError, TypeError, orjson.JSONDecodeError):
+            failed += 1
+    
+    failed += len(error_rows)
+    if failed:
+        print(f"⚠️  {failed}/{len(rows) + len(error_rows)} batch isteği başarısız")
+    print(f"✅ Batch tamamlandı: {len(analysis)} endpoint değerlendirildi\n")
+    return {"analysis": analysis}
+
+# Vision prompt'u sabit: her screenshot isteğinde aynı metin (format/f-string
+# maliyeti yok, system + text prefix'i byte-byte aynı → prefix cache)
+VISION_SYSTEM_PROMPT = "Sen bir güvenlik uzmanısın. Web sayfası görüntülerinde güvenlik açıklarını tespit ediyorsun."
+
+VISION_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "issues_found": {"type": "boolean"},
+        "exploit_type": {
+            "type": "string",
+            "enum": ["Debug Panel", "Stack Trace", "Config Leak", "API Key", "GraphQL", "Other"]
+        },
+        "description": {"type": "string"},
+        "related_endpoint": {"type": "string"},
+        "severity": {
+            "type": "string",
+            "enum": ["Critical", "High", "Medium", "Low", "Info"]
+        }
+    },
+    "required": ["issues_found", "exploit_type", "description", "related_endpoint", "severity"],
+    "additionalProperties": False
+}
+
+VISION_USER_PROMPT = """Sen bir penetrasyon testçisisin. Bu görüntüde EXPLOIT potansiyeli ara.
 
 HEDEF: "Bu panel ne?" değil, "Bu nasıl exploit edilebilir?"
 
@@ -237,62 +573,211 @@ JSON formatında yanıtla:
   "related_endpoint": "/path/to/vulnerable/endpoint veya unknown",
   "severity": "Critical|High|Medium|Low|Info"
 }"""
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}",
-                                    "detail": "low"  # "low" daha ucuz, "high" daha detaylı
-                                }
-                            }
-                        ]
+
+def _image_url(screenshot: Dict, base_dir: str) -> str:
+    """
+    Screenshot için data URL üret
+    
+    - Eski format (base64_image): zaten data URL ise kopyalanmadan döner,
+      değilse header eklenir
+    - Yeni format (path): PNG dosyası okunur, header ile birlikte tek seferde
+      base64'e çevrilir (ayrıca f-string kopyası yok)
+    """
+    base64_image = screenshot.get('base64_image')
+    if base64_image:
+        if base64_image.startswith("data:"):
+            return base64_image
+        return f"data:image/png;base64,{base64_image}"
+    with open(os.path.join(base_dir, screenshot['path']), 'rb') as f:
+        return (b"data:image/png;base64," + base64.b64encode(f.read())).decode('ascii')
+
+def _vision_request_body(image_url: str, model: str) -> Dict:
+    """Screenshot analizi için chat.completions parametreleri (cache anahtarı da bundan üretilir)"""
+    return {
+        "model": model,
+        "messages": [
+            {
+                "role": "system",
+                "content": VISION_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": VISION_USER_PROMPT
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url,
+                            "detail": "low"  # "low" daha ucuz, "high" daha detaylı
+                        }
                     }
-                ],
-                response_format={"type": "json_object"},  # STRUCTURED OUTPUT
-                temperature=0.2,
-                max_tokens=500
-            )
-            
-            # JSON parse (doğrudan çalışır)
-            ai_response = response.choices[0].message.content
-            result = json.loads(ai_response)
-            
-            # URL ekle
-            result['url'] = url
-            all_results.append(result)
-            
-            # Sonucu göster
-            if result.get('issues_found'):
-                severity = result.get('severity', 'Unknown')
-                exploit_type = result.get('exploit_type', 'Unknown')
-                endpoint = result.get('related_endpoint', 'unknown')
-                print(f"    🎯 {severity} - {exploit_type}")
-                print(f"       Endpoint: {endpoint}")
-                print(f"       Exploit: {result.get('description', 'N/A')[:100]}")
-            else:
-                print(f"    ✅ Exploit potansiyeli bulunamadı")
+                ]
+            }
+        ],
+        "response_format": {  # STRUCTURED OUTPUT (strict şema)
+            "type": "json_schema",
+            "json_schema": {"name": "vision_risk_analysis", "strict": True, "schema": VISION_RESPONSE_SCHEMA}
+        },
+        "temperature": 0.2,
+        "max_tokens": 500
+    }
+
+@disk_cache(lambda client, sem, image_url, model: _cache_key(_vision_request_body(image_url, model)))
+async def _analyze_one(client: 'AsyncOpenAI', sem: asyncio.Semaphore, image_url: str, model: str):
+    """Tek bir screenshot'ı Vision API ile analiz et (semaphore ile sınırlı) → (result, usage_tokens)"""
+    async for attempt in _retrying():
+        with attempt:
+            async with sem:
+                response = await client.chat.completions.create(**_vision_request_body(image_url, model))
+    
+    # JSON parse (doğrudan çalışır)
+    ai_response = response.choices[0].message.content
+    usage_tokens = response.usage.total_tokens if response.usage else 0
+    return orjson.loads(ai_response), usage_tokens
+
+async def analyze_screenshots_with_vision(screenshots: Iterable[Dict], api_key: str, model: str = "gpt-4o",
+                                          concurrency: int = 8, base_dir: str = '.',
+                                          http_client: Optional['httpx.AsyncClient'] = None) -> Dict:
+    """
+    OpenAI Vision API ile ekran görüntülerini analiz et
+    
+    GÖRSEL HATA TESPİTİ:
+    - Stack traces (kod hataları)
+    - Debug mode mesajları
+    - Admin panelleri
+    - Hassas bilgi sızıntısı
+    
+    STRUCTURED OUTPUT (json_schema, strict) ile şema garantisi
+    
+    PARALEL İSTEK:
+    - Tüm screenshot'lar AsyncOpenAI + asyncio.gather ile aynı anda gönderilir
+    - asyncio.Semaphore(concurrency) ile eşzamanlı istek sayısı sınırlanır (TPM/RPM)
+    
+    Args:
+        screenshots: [{"url": str, "base64_image": str, ...}] veya [{"url": str, "path": str, ...}]
+        api_key: OpenAI API key
+        model: gpt-4o veya gpt-4o-mini (vision destekli)
+        concurrency: Aynı anda uçuşta olabilecek maksimum istek sayısı
+        base_dir: Screenshot path'lerinin göreli olduğu dizin (scan dosyasının dizini)
+        http_client: Ortak httpx.AsyncClient (verilmezse AsyncOpenAI kendi client'ını açar)
+    
+    Returns:
+        {
+            "visual_analysis": [
+                {
+                    "url": str,
+                    "issues_found": bool,
+                    "description": str,
+                    "severity": str  # Critical/High/Medium/Low/Info
+                }
+            ]
+        }
+    """
+    
+    # İlk 10 screenshot (maliyet kontrolü), görüntüsü olmayanları atla
+    shots = [s for s in islice(screenshots or [], 10) if s.get('base64_image') or s.get('path')]
+    
+    if not shots:
+        print("ℹ️  Screenshot bulunamadı - Vision analizi atlanıyor")
+        return {"visual_analysis": []}
+    
+    # Aynı görüntüler (sayfalama, ortak header/footer) sadece bir kez gönderilir
+    try:
+        from blake3 import blake3  # Hızlı hash
+    except ImportError:
+        blake3 = hashlib.blake2b  # Digest sadece bu çalışmada tekilleştirme için
+    
+    digests = []
+    unique_images = {}  # digest → image_url
+    unreadable = {}  # okunamayan PNG → hata (diğer screenshot'lar yine analiz edilir)
+    for idx, shot in enumerate(shots):
+        try:
+            image_url = _image_url(shot, base_dir)
+        except OSError as e:  # -shots/ klasörü taşınmış/silinmiş olabilir
+            digests.append(f"unreadable:{idx}")
+            unreadable[digests[-1]] = e
+            continue
+        digest = blake3(image_url.encode()).hexdigest()
+        digests.append(digest)
+        unique_images.setdefault(digest, image_url)
+    
+    print(f"👁️  Vision Analizi Başlatılıyor...")
+    print(f"📸 {len(shots)} screenshot analiz edilecek ({len(unique_images)} benzersiz)")
+    print(f"🔧 Model: {model} (eşzamanlı: {concurrency})\n")
+    
+    sem = asyncio.Semaphore(concurrency)
+    from openai import AsyncOpenAI
+    
+    client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)  # retry: _retrying()
+    
+    tasks = [_analyze_one(client, sem, image_url, model) for image_url in unique_images.values()]
+    results = dict(zip(unique_images, await asyncio.gather(*tasks, return_exceptions=True)))
+    results.update(unreadable)
+    
+    all_results = []
+    seen = set()
+    
+    for idx, (screenshot, digest) in enumerate(zip(shots, digests), 1):
+        url = screenshot.get('url', 'unknown')
+        result = results[digest]
+        print(f"  [{idx}/{len(shots)}] {url[:60]}")
+        if digest in seen:
+            print("    ♻️  Aynı görüntü - önceki sonuç kullanıldı")
+        seen.add(digest)
         
-        except json.JSONDecodeError as e:
-            print(f"    ❌ JSON parse hatası: {e}")
-            all_results.append({
-                "url": url,
-                "issues_found": False,
-                "description": "Parse error",
-                "severity": "Info"
-            })
-        except Exception as e:
-            print(f"    ❌ Vision analizi hatası: {e}")
+        if isinstance(result, Exception):
+            print(f"    ❌ Vision analizi hatası: {result}")
             all_results.append({
                 "url": url,
                 "issues_found": False,
-                "description": f"Error: {str(e)}",
+                "description": f"Error: {str(result)}",
                 "severity": "Info"
             })
+            continue
+        
+        result, _ = result
+        # URL ekle (aynı görüntüyü paylaşan screenshot'lar aynı sonucu kopyalar)
+        result = {**result, 'url': url}
+        
+        if result.get('issues_found'):
+            # Sonucu göster
+            severity = result.get('severity', 'Unknown')
+            exploit_type = result.get('exploit_type', 'Unknown')
+            endpoint = result.get('related_endpoint', 'unknown')
+            print(f"    🎯 {severity} - {exploit_type}")
+            print(f"       Endpoint: {endpoint}")
+            print(f"       Exploit: {result.get('description', 'N/A')[:100]}")
+        else:
+            print(f"    ✅ Exploit potansiyeli bulunamadı")
+        
+        all_results.append(result)
     
     print(f"\n✅ Vision analizi tamamlandı\n")
     return {"visual_analysis": all_results}
 
 
+# Risk/severity sıralaması ve ikonları (tüm display fonksiyonları ortak kullanır)
+RISK_ORDER = {'Critical': 0, 'High': 1, 'Medium': 2, 'Low': 3, 'Info': 4}
+RISK_ICONS = {'Critical': '🔴', 'High': '🟠', 'Medium': '🟡', 'Low': '🔵', 'Info': '⚪'}
+
+def _bucket_by_level(results: List[Dict], flag_key: str, level_key: str) -> Dict[str, List[Dict]]:
+    """
+    flag_key=true olan kayıtları seviyeye göre tek geçişte grupla
+    
+    Kovalar RISK_ORDER sırasındadır: birleştirmek sıralı liste, len() ise
+    seviye sayısını verir (ayrı filter/sort/count geçişi yok). Bilinmeyen
+    seviye 'Low' sayılır.
+    """
+    buckets = {level: [] for level in RISK_ORDER}
+    low = buckets['Low']
+    for r in results:
+        if r.get(flag_key):
+            buckets.get(r.get(level_key), low).append(r)
+    return buckets
+
 def display_endpoint_analysis(analysis: Dict):
     """Endpoint analiz sonuçlarını göster"""
     if 'error' in analysis:
@@ -305,10 +790,10 @@ def display_endpoint_analysis(analysis: Dict):
         print("ℹ️  Endpoint analizi sonucu yok")
         return
     
-    # Sadece risk tespit edilenleri filtrele
-    risks = [r for r in results if r.get('risk_detected')]
+    # Risk tespit edilenler, seviyeye göre sıralı (tek geçiş)
+    ranked = list(chain.from_iterable(_bucket_by_level(results, 'risk_detected', 'risk_level').values()))
     
-    if not risks:
+    if not ranked:
         print("✅ Endpoint'lerde kritik risk tespit edilmedi!")
         return
     
@@ -316,11 +801,7 @@ def display_endpoint_analysis(analysis: Dict):
     print("🎯 ENDPOINT GÜVENLİK ANALİZİ")
     print("=" * 60)
     
-    # Risk seviyesine göre sırala
-    risk_order = {'Critical': 0, 'High': 1, 'Medium': 2, 'Low': 3, 'Info': 4}
-    risks.sort(key=lambda x: risk_order.get(x.get('risk_level', 'Low'), 3))
-    
-    for idx, risk in enumerate(risks, 1):
+    for idx, risk in enumerate(ranked, 1):
         level = risk.get('risk_level', 'Unknown')
         risk_type = risk.get('risk_type', 'Unknown')
         endpoint = risk.get('endpoint', 'N/A')
@@ -328,8 +809,7 @@ def display_endpoint_analysis(analysis: Dict):
         cvss = risk.get('cvss_score', 'N/A')
         
         # Icon
-        icons = {'Critical': '🔴', 'High': '🟠', 'Medium': '🟡', 'Low': '🔵', 'Info': '⚪'}
-        icon = icons.get(level, '⚪')
+        icon = RISK_ICONS.get(level, '⚪')
         
         print(f"\n{icon} [{level}] {risk_type}")
         print(f"   Endpoint: {endpoint}")
@@ -347,10 +827,10 @@ def display_vision_analysis(vision_results: Dict):
         print("ℹ️  Vision analizi sonucu yok")
         return
     
-    # issues_found=true olanları filtrele
-    issues = [r for r in results if r.get('issues_found')]
+    # issues_found=true olanlar, severity'ye göre sıralı (tek geçiş)
+    ranked = list(chain.from_iterable(_bucket_by_level(results, 'issues_found', 'severity').values()))
     
-    if not issues:
+    if not ranked:
         print("✅ Screenshot'larda exploit potansiyeli bulunamadı!")
         return
     
@@ -358,11 +838,7 @@ def display_vision_analysis(vision_results: Dict):
     print("👁️  GÖRSEL EXPLOIT ANALİZİ")
     print("=" * 60)
     
-    # Severity'ye göre sırala
-    severity_order = {'Critical': 0, 'High': 1, 'Medium': 2, 'Low': 3, 'Info': 4}
-    issues.sort(key=lambda x: severity_order.get(x.get('severity', 'Low'), 3))
-    
-    for idx, issue in enumerate(issues, 1):
+    for idx, issue in enumerate(ranked, 1):
         severity = issue.get('severity', 'Unknown')
         exploit_type = issue.get('exploit_type', 'Unknown')
         url = issue.get('url', 'N/A')
@@ -370,8 +846,7 @@ def display_vision_analysis(vision_results: Dict):
         endpoint = issue.get('related_endpoint', 'unknown')
         
         # Icon
-        icons = {'Critical': '🔴', 'High': '🟠', 'Medium': '🟡', 'Low': '🔵', 'Info': '⚪'}
-        icon = icons.get(severity, '⚪')
+        icon = RISK_ICONS.get(severity, '⚪')
         
         print(f"\n{icon} [{severity}] {exploit_type} - Screenshot #{idx}")
         print(f"   URL: {url[:80]}")
@@ -382,51 +857,61 @@ def display_vision_analysis(vision_results: Dict):
 
 def save_analysis(analysis, output_file):
     """Analizi dosyaya kaydet"""
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(analysis, f, indent=2, ensure_ascii=False)
+    Path(output_file).write_bytes(orjson.dumps(analysis, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
     print(f"\n💾 Analiz kaydedildi: {output_file}")
 
-def main():
-    if len(sys.argv) < 2:
-        print("Kullanım:")
-        print("  python analyze_with_ai.py scan-results.json")
-        print("  python analyze_with_ai.py scan-results.json --model gpt-4o")
-        print("  python analyze_with_ai.py scan-results.json --vision-only")
-        sys.exit(1)
+def _create_http_client() -> 'httpx.AsyncClient':
+    """
+    Tüm OpenAI trafiği için ortak bağlantı havuzu
     
-    # Parametreler
-    scan_file = sys.argv[1]
-    endpoint_model = "gpt-3.5-turbo"  # Endpoint analizi için (ucuz)
-    vision_model = "gpt-4o"           # Vision analizi için (premium quality)
-    vision_only = '--vision-only' in sys.argv
-    
-    if '--model' in sys.argv:
-        model_idx = sys.argv.index('--model')
-        if len(sys.argv) > model_idx + 1:
-            custom_model = sys.argv[model_idx + 1]
-            endpoint_model = custom_model
-            # Vision için o veya mini olmalı
-            if 'gpt-4' in custom_model:
-                vision_model = "gpt-4o" if "gpt-4o" in custom_model else "gpt-4o-mini"
+    HTTP/2 + keep-alive: TLS handshake bir kez yapılır, paralel istekler
+    aynı bağlantı üzerinden multiplex edilir.
+    """
+    import httpx
     
-    # OpenAI API key
-    api_key = os.getenv('OPENAI_API_KEY')
-    if not api_key:
-        print("❌ OPENAI_API_KEY environment variable bulunamadı!")
-        print("PowerShell'de şunu çalıştır:")
-        print('   $env:OPENAI_API_KEY="sk-your-key-here"')
-        sys.exit(1)
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=60,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)
+    )
+
+def _select_vision_model(model: str) -> str:
+    """Endpoint modeline göre Vision modeli seç (Vision için o veya mini olmalı)"""
+    if 'gpt-4' in model:
+        return "gpt-4o" if "gpt-4o" in model else "gpt-4o-mini"
+    return "gpt-4o"  # Vision analizi için (premium quality)
+
+async def run(results: Dict, api_key: str, model: str = "gpt-4o-mini", vision_only: bool = False,
+              scan_file: str = "scan-results.json", concurrency: int = 8, batch_mode: bool = False) -> Dict:
+    """
+    Scan sonuçlarını analiz et, kaydet ve özetle
     
-    # Scan sonuçlarını yükle
-    print(f"📂 Dosya yükleniyor: {scan_file}")
-    results = load_scan_results(scan_file)
+    scan_website.py taramadan sonra bunu doğrudan çağırır (ayrı process ve
+    JSON'u diskten tekrar okuma yok).
+    
+    Args:
+        results: Crawler çıktısı; endpoints/screenshots list veya iterator olabilir
+        api_key: OpenAI API key
+        model: Endpoint analizi modeli (Vision modeli buna göre seçilir)
+        vision_only: Sadece Vision analizi
+        scan_file: Scan dosyası (çıktı adı ve screenshot path'leri için)
+        concurrency: Eşzamanlı AI isteği
+        batch_mode: Endpoint analizini Batch API'ye gönder
+    
+    Returns:
+        Kaydedilen analiz sonuçları
+    """
+    vision_model = _select_vision_model(model)
+    output_file = scan_file.replace('.json', '-ai-analysis.json')
     
-    endpoints = results.get('endpoints', [])
-    screenshots = results.get('screenshots', [])
     stats = results.get('statistics', {})
+    endpoints = None if vision_only else _peek(results.get('endpoints') or [])
+    screenshots = _peek(results.get('screenshots') or [])
     
-    print(f"✓ {len(endpoints)} endpoint")
-    print(f"✓ {len(screenshots)} screenshot")
+    # Crawler istatistiği (benzersiz METHOD:URL); analiz edilen kayıt sayısını
+    # analyze_endpoints_with_ai yazar - endpoint'ler stream, burada sayılmaz
+    print(f"✓ {stats.get('unique_endpoints', 0)} benzersiz URL (tarama istatistiği)")
+    print(f"✓ {stats.get('screenshots_captured', 0)} screenshot")
     print(f"✓ {stats.get('pages_crawled', 0)} sayfa taranmış\n")
     
     print("=" * 60)
@@ -436,23 +921,43 @@ def main():
     
     final_results = {}
     
-    # 1. ENDPOINT ANALİZİ (vision-only değilse)
-    if not vision_only and endpoints:
-        endpoint_analysis = analyze_endpoints_with_ai(endpoints, api_key, endpoint_model)
-        final_results['endpoint_analysis'] = endpoint_analysis
-        display_endpoint_analysis(endpoint_analysis)
+    # Endpoint analizi Batch API'ye gönderilirse burada senkron çalışmaz
+    if endpoints and batch_mode:
+        prefix = os.path.splitext(os.path.basename(scan_file))[0]
+        batch = submit_endpoints_batch(endpoints, api_key, model, prefix=prefix)
+        endpoints = None
+        if 'error' in batch:
+            final_results['endpoint_analysis'] = batch  # Hata kaydedilir, Vision yine çalışır
+        else:
+            print("   Sonucu almak için:")
+            print(f"   python analyze_with_ai.py {scan_file} --poll {batch['batch_id']}\n")
     
-    # 2. VISION ANALİZİ (screenshot varsa)
-    if screenshots:
-        vision_analysis = analyze_screenshots_with_vision(screenshots, api_key, vision_model)
-        final_results['vision_analysis'] = vision_analysis
-        display_vision_analysis(vision_analysis)
-    else:
-        print("ℹ️  Screenshot bulunamadı - Vision analizi atlanıyor")
-        print("   Screenshot almak için scan yaparken --capture-screenshots kullan\n")
+    http_client = _create_http_client()
+    
+    try:
+        # 1. ENDPOINT ANALİZİ
+        if endpoints:
+            endpoint_analysis = await analyze_endpoints_with_ai(
+                endpoints, api_key, model, concurrency, http_client=http_client
+            )
+            final_results['endpoint_analysis'] = endpoint_analysis
+            display_endpoint_analysis(endpoint_analysis)
+        
+        # 2. VISION ANALİZİ (screenshot varsa)
+        if screenshots:
+            vision_analysis = await analyze_screenshots_with_vision(
+                screenshots, api_key, vision_model, concurrency,
+                base_dir=os.path.dirname(os.path.abspath(scan_file)), http_client=http_client
+            )
+            final_results['vision_analysis'] = vision_analysis
+            display_vision_analysis(vision_analysis)
+        else:
+            print("ℹ️  Screenshot bulunamadı - Vision analizi atlanıyor")
+            print("   Screenshot almak için scan yaparken --capture-screenshots kullan\n")
+    finally:
+        await http_client.aclose()
     
     # Kaydet
-    output_file = scan_file.replace('.json', '-ai-analysis.json')
     save_analysis(final_results, output_file)
     
     # ÖZET
@@ -462,19 +967,60 @@ def main():
     
     if 'endpoint_analysis' in final_results:
         ep_results = final_results['endpoint_analysis'].get('analysis', [])
-        ep_risks = [r for r in ep_results if r.get('risk_detected')]
-        critical = sum(1 for r in ep_risks if r.get('risk_level') == 'Critical')
-        high = sum(1 for r in ep_risks if r.get('risk_level') == 'High')
-        print(f"🎯 Endpoint: {len(ep_risks)} risk ({critical} Critical, {high} High)")
+        b = _bucket_by_level(ep_results, 'risk_detected', 'risk_level')
+        print(f"🎯 Endpoint: {sum(map(len, b.values()))} risk ({len(b['Critical'])} Critical, {len(b['High'])} High)")
     
     if 'vision_analysis' in final_results:
         vis_results = final_results['vision_analysis'].get('visual_analysis', [])
-        vis_issues = [r for r in vis_results if r.get('issues_found')]
-        critical_vis = sum(1 for r in vis_issues if r.get('severity') == 'Critical')
-        high_vis = sum(1 for r in vis_issues if r.get('severity') == 'High')
-        print(f"👁️  Vision: {len(vis_issues)} sorun ({critical_vis} Critical, {high_vis} High)")
+        b = _bucket_by_level(vis_results, 'issues_found', 'severity')
+        print(f"👁️  Vision: {sum(map(len, b.values()))} sorun ({len(b['Critical'])} Critical, {len(b['High'])} High)")
     
     print("=" * 60)
+    return final_results
+
+def main():
+    parser = argparse.ArgumentParser(description='AI-powered endpoint security analysis with Vision API')
+    parser.add_argument('scan_file', help='Scan results JSON (e.g., scan-example.com.json)')
+    parser.add_argument('--model', default='gpt-4o-mini', help='Endpoint analysis model (default: gpt-4o-mini)')
+    parser.add_argument('--vision-only', action='store_true', help='Only run Vision analysis')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent AI requests (default: 8)')
+    parser.add_argument('--batch', action='store_true', help='Submit endpoint analysis via Batch API (50%% cheaper, up to 24h)')
+    parser.add_argument('--poll', metavar='BATCH_ID', help='Fetch Batch results and merge into the analysis file')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use .ai_cache (every call hits the API)')
+    
+    args = parser.parse_args()
+    scan_file = args.scan_file
+    concurrency = max(1, args.concurrency)  # Eşzamanlı AI isteği (TPM/RPM sınırı altında)
+    
+    # OpenAI API key
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        print("❌ OPENAI_API_KEY environment variable bulunamadı!")
+        print("PowerShell'de şunu çalıştır:")
+        print('   $env:OPENAI_API_KEY="sk-your-key-here"')
+        sys.exit(1)
+    
+    if not args.no_cache:
+        enable_disk_cache()
+    
+    # Batch sonucunu al ve mevcut analiz dosyasına ekle
+    if args.poll:
+        output_file = scan_file.replace('.json', '-ai-analysis.json')
+        endpoint_analysis = poll_endpoints_batch(args.poll, api_key)
+        display_endpoint_analysis(endpoint_analysis)
+        
+        final_results = {}
+        if os.path.exists(output_file):
+            final_results = load_scan_results(output_file)
+        final_results['endpoint_analysis'] = endpoint_analysis
+        save_analysis(final_results, output_file)
+        return
+    
+    # Scan sonuçlarını yükle
+    print(f"📂 Dosya yükleniyor: {scan_file}")
+    results = load_scan_results_streaming(scan_file)
+    
+    asyncio.run(run(results, api_key, args.model, args.vision_only, scan_file, concurrency, args.batch))
 
 if __name__ == '__main__':
     main()
@@ -32,6 +32,10 @@ async def scan_website(target_url, max_pages=30, max_depth=3, capture_screenshot
     print("=" * 60)
     print()
     
+    # Generate output names from URL
+    domain = target_url.replace('https://', '').replace('http://', '').replace('/', '-').replace(':', '-')
+    output_file = f'scan-{domain}.json'
+    
     # Configure crawler
     config = CrawlConfig(
         target_url=target_url,
@@ -43,6 +47,7 @@ async def scan_website(target_url, max_pages=30, max_depth=3, capture_screenshot
         wait_for_network_idle=False,
         respect_robots_txt=True,
         capture_screenshots=capture_screenshots,  # Vision API için
+        screenshot_dir=f'scan-{domain}-shots',  # PNG dosyaları (JSON'da sadece path)
         user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     )
     
@@ -75,29 +80,23 @@ async def scan_website(target_url, max_pages=30, max_depth=3, capture_screenshot
                         params += f" ... (+{len(ep['parameters'])-5} more)"
                     print(f"   Parameters: {params}")
         
-        # Generate output filename from URL
-        domain = target_url.replace('https://', '').replace('http://', '').replace('/', '-').replace(':', '-')
-        output_file = f'scan-{domain}.json'
-        
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(results, f, indent=2, ensure_ascii=False)
         
         print(f"\n💾 Full results saved to: {output_file}")
         print("\n✅ Scan completed successfully!")
         
-        # Return output file for AI analysis
-        return output_file
+        # Return output file + in-memory results for AI analysis
+        return output_file, results
         
     except Exception as e:
         print(f"\n❌ Scan failed: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
-        return None
-        return None
 
-def run_ai_analysis(scan_file, model="gpt-3.5-turbo", vision_only=False):
-    """Run AI analysis on scan results"""
+def run_ai_analysis(scan_file, results, model="gpt-4o-mini", vision_only=False, use_cache=True):
+    """Run AI analysis on in-memory scan results (same process, no JSON re-read)"""
     api_key = os.getenv('OPENAI_API_KEY')
     
     if not api_key:
@@ -110,21 +109,12 @@ def run_ai_analysis(scan_file, model="gpt-3.5-turbo", vision_only=False):
     print("=" * 60)
     
     try:
-        # analyze_with_ai.py'yi çalıştır
-        import subprocess
-        cmd = [sys.executable, 'analyze_with_ai.py', scan_file, '--model', model]
-        if vision_only:
-            cmd.append('--vision-only')
-        
-        result = subprocess.run(
-            cmd,
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-            capture_output=False,
-            text=True
-        )
+        # OpenAI bağımlılıkları sadece AI analizi çalışırken yüklenir (--no-ai hızlı kalır)
+        from analyze_with_ai import run, enable_disk_cache
         
-        if result.returncode != 0:
-            print("⚠️  AI analizi tamamlanamadı")
+        if use_cache:
+            enable_disk_cache()
+        asyncio.run(run(results, api_key, model, vision_only, scan_file))
     except Exception as e:
         print(f"⚠️  AI analizi hatası: {e}")
 
@@ -135,8 +125,9 @@ if __name__ == '__main__':
     parser.add_argument('--depth', type=int, default=2, help='Max crawl depth (default: 2)')
     parser.add_argument('--screenshots', action='store_true', help='Capture screenshots for Vision API analysis')
     parser.add_argument('--no-ai', action='store_true', help='Skip AI analysis (only scan)')
-    parser.add_argument('--ai-model', type=str, default='gpt-3.5-turbo', help='AI model (gpt-3.5-turbo, gpt-4, gpt-4o)')
+    parser.add_argument('--ai-model', type=str, default='gpt-4o-mini', help='AI model (gpt-4o-mini, gpt-4o; json_schema destekli olmalı)')
     parser.add_argument('--vision-only', action='store_true', help='Only run Vision analysis (skip endpoint analysis)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use .ai_cache (every AI call hits the API)')
     
     args = parser.parse_args()
     
@@ -146,8 +137,8 @@ if __name__ == '__main__':
         sys.exit(1)
     
     # Run scan
-    output_file = asyncio.run(scan_website(args.url, args.pages, args.depth, args.screenshots))
+    output_file, results = asyncio.run(scan_website(args.url, args.pages, args.depth, args.screenshots))
     
     # Run AI analysis (unless --no-ai flag is set)
-    if not args.no_ai and output_file:
-        run_ai_analysis(output_file, args.ai_model, args.vision_only)
+    if not args.no_ai:
+        run_ai_analysis(output_file, results, args.ai_model, args.vision_only, use_cache=not args.no_cache)
@@ -23,38 +23,213 @@ Success Criteria:
 """
 
 import asyncio
+import base64
+import contextlib
+import functools
 import json
 import hashlib
+import io
 import logging
-from typing import List, Dict, Optional, Set
-from urllib.parse import urlparse, urljoin
-from dataclasses import dataclass, asdict
-from datetime import datetime
+import os
+import re
+import time
+from collections import deque
+from types import MappingProxyType
+from typing import List, Dict, Optional, Set, Deque, Iterator
+from urllib.parse import urlparse, urljoin, urlencode, urlunparse, parse_qsl, ParseResult
+from dataclasses import dataclass, asdict, field, fields
+from datetime import datetime, timezone
 
 try:
     from playwright.async_api import async_playwright, Page, Browser, BrowserContext, Route, Request
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 except ImportError:
     raise ImportError(
         "Playwright not installed. Install with: pip install playwright && playwright install chromium"
     )
 
+try:
+    from PIL import Image  # Optional: screenshot downscaling
+except ImportError:
+    Image = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+def _downscale_png(png_bytes: bytes, max_size: int):
+    """Shrink a PNG to fit max_size x max_size -> (png_bytes, width, height)"""
+    img = Image.open(io.BytesIO(png_bytes))
+    img.thumbnail((max_size, max_size), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, 'PNG', optimize=True)
+    return buf.getvalue(), img.width, img.height
+
+
+# CDP Network.ResourceType -> Playwright resource_type (only API-like traffic is kept)
+_CDP_RESOURCE_TYPES = {'Fetch': 'fetch', 'XHR': 'xhr', 'WebSocket': 'websocket'}
+# Same set as Playwright names it (fallback path for non-Chromium browsers).
+# Filtering stays on our side: Fetch.enable patterns would pause every matching
+# request until Fetch.continueRequest - one extra round-trip per API call.
+_CAPTURED_RESOURCE_TYPES = frozenset(_CDP_RESOURCE_TYPES.values())
+
+# Extra Chromium flags to shrink per-process memory on long crawls. Not in
+# Playwright's default switches; --disable-features is left alone because a
+# second copy would replace Playwright's own list (Chromium keeps the last one).
+_CHROMIUM_MEMORY_ARGS = [
+    '--disable-gpu',  # Headless: no GPU process
+    '--no-zygote',  # No pre-forked zygote process (needs --no-sandbox)
+    '--disable-site-isolation-trials',  # Fewer renderers (no per-site processes)
+    '--js-flags=--max-old-space-size=512',  # Cap V8 heap per renderer
+]
+
+# Heap cap for the Playwright driver (node) process
+_DRIVER_HEAP_MB = 1024
+
+
+def _with_heap_limit(node_options: Optional[str], heap_mb: int) -> str:
+    """Existing NODE_OPTIONS with any --max-old-space-size replaced by heap_mb"""
+    kept = [opt for opt in (node_options or '').split() if not opt.startswith('--max-old-space-size')]
+    return ' '.join(kept + [f'--max-old-space-size={heap_mb}'])
+
+
+@contextlib.asynccontextmanager
+async def _start_playwright(driver_heap_mb: int):
+    """
+    async_playwright() with a bounded driver heap
+    
+    The driver copies os.environ when it is spawned in start(), so
+    NODE_OPTIONS is only changed around that call and restored right after:
+    the host process and later subprocesses keep their own environment.
+    """
+    previous = os.environ.get('NODE_OPTIONS')
+    os.environ['NODE_OPTIONS'] = _with_heap_limit(previous, driver_heap_mb)
+    try:
+        playwright = await async_playwright().start()
+    finally:
+        if previous is None:
+            os.environ.pop('NODE_OPTIONS', None)
+        else:
+            os.environ['NODE_OPTIONS'] = previous
+    
+    try:
+        yield playwright
+    finally:
+        await playwright.stop()
+
+
+# Static assets blocked in the browser (Network.setBlockedURLs) when no screenshots are taken
+_BLOCKED_STATIC_URLS = [
+    f"*.{ext}{suffix}"
+    for ext in ('png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'ico', 'woff', 'woff2', 'ttf', 'mp4', 'webm')
+    for suffix in ('', '?*')
+]
+# Stylesheets are blocked too, but only without simulate_user: the interaction
+# script decides visibility from layout/computed style, and without CSS hidden
+# buttons (closed modals, delete dialogs, admin menus) would look visible
+_BLOCKED_STATIC_AND_CSS_URLS = _BLOCKED_STATIC_URLS + ['*.css', '*.css?*']
+
+
+# Path segments that are IDs: numeric or UUID-like (same heuristic as the AST extractor)
+_ID_SEGMENT_RE = re.compile(r'\d+|[0-9a-f-]{36}')  # Case-sensitive, like extract.js
+
+
+@functools.lru_cache(maxsize=4096)
+def _parameterize_path(path: str) -> str:
+    """
+    Convert /users/123/orders/456 → /users/{userId}/orders/{orderId}
+    (Same heuristic as AST extractor for consistency)
+    
+    Memoized: a crawl repeats the same few paths many times.
+    """
+    segments = path.split('/')
+    parameterized = []
+    
+    for i, seg in enumerate(segments):
+        if _ID_SEGMENT_RE.fullmatch(seg):
+            # Numeric ID / UUID
+            prev_segment = segments[i-1] if i > 0 else 'item'
+            param_name = prev_segment.rstrip('s') + 'Id' if prev_segment.endswith('s') else prev_segment + 'Id'
+            parameterized.append(f"{{{param_name}}}")
+        else:
+            parameterized.append(seg)
+    
+    return '/'.join(parameterized)
+
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443, 'ws': 80, 'wss': 443}
+
+# Headers worth keeping per request/response (everything else is dropped at capture)
+_KEPT_HEADERS = frozenset({'content-type', 'authorization'})
+
+
+def _filter_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """Keep only content-type, authorization and x-* headers (names as sent)"""
+    return {
+        name: value for name, value in headers.items()
+        if name.lower() in _KEPT_HEADERS or name[:2].lower() == 'x-'
+    }
+
+
+def _canonical_url(parsed: ParseResult) -> str:
+    """
+    Normalize a URL so trivially different spellings collapse to one key
+    
+    Lowercase scheme/host, drop default port, fragment and trailing slash,
+    sort query parameters.
+    """
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    try:
+        host, port = parsed.hostname or '', parsed.port
+        if ':' in host:
+            host = f"[{host}]"  # IPv6
+        netloc = host if port is None or _DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    except ValueError:
+        pass  # Malformed port: keep netloc as-is
+    
+    path = parsed.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, netloc, path, parsed.params, query, ''))
+
+
+# Shared tail of every query parameter record (only 'name' varies)
+_QUERY_PARAM_DEFAULTS = MappingProxyType({
+    'location': 'query',
+    'param_type': 'string',  # Conservative default
+    'required': False
+})
+
+
+def _iso_timestamp(ns: int) -> str:
+    """time.time_ns() -> '2024-01-01T12:00:00.123456Z' (same format as utcnow().isoformat() + 'Z')"""
+    return datetime.fromtimestamp(ns / 1e9, timezone.utc).replace(tzinfo=None).isoformat() + 'Z'
+
+
+@dataclass(slots=True)
 class NetworkRequest:
-    """Captured network request"""
+    """Captured network request (slotted: up to max_requests live at once)"""
     url: str
     method: str
     headers: Dict[str, str]
     post_data: Optional[str]
     resource_type: str  # fetch, xhr, websocket, etc.
-    timestamp: str
+    timestamp_ns: int  # time.time_ns() at capture, formatted only on export
     status_code: Optional[int] = None
     response_headers: Optional[Dict[str, str]] = None
     response_time_ms: Optional[float] = None
+    parsed: Optional[ParseResult] = field(default=None, repr=False, compare=False)  # urlparse(url), not exported
+    
+    def to_dict(self) -> Dict:
+        """JSON-ready dict (ISO 'timestamp', without the cached parsed URL)"""
+        data = {}
+        for f in fields(self):
+            if f.name == 'timestamp_ns':
+                data['timestamp'] = _iso_timestamp(self.timestamp_ns)
+            elif f.name != 'parsed':
+                data[f.name] = getattr(self, f.name)
+        return data
 
 
 @dataclass
@@ -62,9 +237,10 @@ class Screenshot:
     """Captured page screenshot for Vision API"""
     url: str
     timestamp: str
-    base64_image: str  # Base64 encoded PNG
     width: int
     height: int
+    base64_image: Optional[str] = None  # Base64 encoded PNG (inline mode)
+    path: Optional[str] = None  # PNG file path (screenshot_dir mode)
 
 
 @dataclass
@@ -87,9 +263,17 @@ class CrawlConfig:
     simulate_user: bool = True  # Click buttons, fill forms, scroll
     wait_for_network_idle: bool = True
     capture_screenshots: bool = False
+    screenshot_dir: Optional[str] = None  # Write PNG files here instead of inline base64
+    screenshot_max_size: Optional[int] = 1024  # Downscale to this bounding box (needs Pillow, None = keep)
+    block_static_assets: bool = True  # Don't download images/fonts/media (+CSS without simulate_user; Chromium, no screenshots)
     
     # Resource limits
     max_concurrent_pages: int = 3
+    per_host_rate_hz: float = 5  # Max page navigations per second per host (politeness), 0 = unthrottled
+    context_recycle_pages: int = 25  # Fresh browser context every N pages (bounds RSS), 0 = never
+    page_recycle_navigations: int = 10  # Reuse a worker's page for N navigations, then replace it, 0 = never
+    max_requests: int = 5000  # network_log keeps the last N requests (endpoints are kept regardless), 0 = all
+    network_log_path: Optional[str] = None  # Also stream every captured request to this NDJSON file
     respect_robots_txt: bool = True
 
 
@@ -101,11 +285,20 @@ class RuntimeCrawler:
     def __init__(self, config: CrawlConfig):
         self.config = config
         self.discovered_endpoints: Set[str] = set()
-        self.network_log: List[NetworkRequest] = []
+        # Bounded: only the most recent config.max_requests are exported
+        self.network_log: Deque[NetworkRequest] = deque(maxlen=config.max_requests or None)
+        self._endpoint_requests: Dict[str, NetworkRequest] = {}  # "METHOD:template" -> first request
+        self._request_count = 0
+        self._log_file = None
+        self._next_nav_slot: Dict[str, float] = {}  # host -> earliest monotonic time for next navigation
         self.screenshots: List[Screenshot] = []  # Screenshot'lar Vision API için
         self.visited_urls: Set[str] = set()
         self.browser: Optional[Browser] = None
-        self.context: Optional[BrowserContext] = None
+        # Requests awaiting a response: CDP requestId (Chromium) or Playwright Request
+        self._pending: Dict[object, NetworkRequest] = {}
+        # Pages whose renderer crashed ('crash' event; is_closed() stays False)
+        self._crashed_pages: Set[Page] = set()
+        self._crash_retried: Set[str] = set()  # URLs re-queued once after a crash
         
     async def crawl(self) -> Dict:
         """
@@ -116,96 +309,209 @@ class RuntimeCrawler:
         """
         start_time = datetime.now()
         
-        async with async_playwright() as playwright:
+        async with _start_playwright(_DRIVER_HEAP_MB) as playwright:
             # Launch browser
             browser_launcher = getattr(playwright, self.config.browser_type)
+            launch_args = [
+                '--disable-blink-features=AutomationControlled',  # Anti-detection
+                '--disable-dev-shm-usage',  # Docker compatibility
+                '--no-sandbox'  # CI environment compatibility
+            ]
+            if self._use_cdp:
+                launch_args += _CHROMIUM_MEMORY_ARGS
             self.browser = await browser_launcher.launch(
                 headless=self.config.headless,
-                args=[
-                    '--disable-blink-features=AutomationControlled',  # Anti-detection
-                    '--disable-dev-shm-usage',  # Docker compatibility
-                    '--no-sandbox'  # CI environment compatibility
-                ]
+                args=launch_args
             )
             
             logger.info(f"Launched {self.config.browser_type} browser (headless={self.config.headless})")
             
-            # Create browser context (isolated session)
-            context_options = {
-                'viewport': self.config.viewport or {'width': 1920, 'height': 1080},
-                'user_agent': self.config.user_agent,
-                'ignore_https_errors': True,  # Allow self-signed certs in test environments
-            }
-            
-            self.context = await self.browser.new_context(**context_options)
-            
-            # Set cookies (for authenticated scans)
-            if self.config.cookies:
-                await self.context.add_cookies(self.config.cookies)
-                logger.info(f"Added {len(self.config.cookies)} authentication cookies")
-            
-            # Set auth header (if provided)
-            if self.config.auth_header:
-                await self.context.set_extra_http_headers({
-                    'Authorization': self.config.auth_header
-                })
+            if self.config.network_log_path:
+                self._log_file = open(self.config.network_log_path, 'w', encoding='utf-8')
             
-            # Register network interception
-            self.context.on('request', self._on_request)
-            self.context.on('response', self._on_response)
+            # Breadth-first crawl from target URL: N workers share one queue,
+            # each with its own browser context (isolated session)
+            queue: asyncio.Queue = asyncio.Queue()
+            self._enqueue(queue, self.config.target_url, depth=0)
             
-            # Start crawling from target URL
+            workers = [
+                asyncio.create_task(self._worker(queue))
+                for _ in range(max(1, self.config.max_concurrent_pages))
+            ]
             try:
-                await self._crawl_page(self.config.target_url, depth=0)
+                await queue.join()
             except Exception as e:
                 logger.error(f"Crawl failed: {e}", exc_info=True)
             
-            # Cleanup
-            await self.context.close()
+            # Cleanup (idle workers are waiting on queue.get())
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
             await self.browser.close()
+            
+            if self._log_file:
+                self._log_file.close()
+                self._log_file = None
         
         elapsed_ms = (datetime.now() - start_time).total_seconds() * 1000
         
         return {
-            'endpoints': self._extract_unique_endpoints(),
-            'network_log': [asdict(req) for req in self.network_log],
-            'screenshots': [asdict(sc) for sc in self.screenshots],  # Vision API için
+            'endpoints': list(self._iter_unique_endpoints()),
+            'network_log': [req.to_dict() for req in self.network_log],
+            'screenshots': [
+                {k: v for k, v in asdict(sc).items() if v is not None}
+                for sc in self.screenshots
+            ],  # Vision API için
             'visited_urls': list(self.visited_urls),
             'statistics': {
                 'pages_crawled': len(self.visited_urls),
-                'network_requests': len(self.network_log),
+                'network_requests': self._request_count,
                 'unique_endpoints': len(self.discovered_endpoints),
                 'screenshots_captured': len(self.screenshots),
                 'duration_ms': elapsed_ms
             }
         }
     
-    async def _crawl_page(self, url: str, depth: int):
+    def _enqueue(self, queue: asyncio.Queue, url: str, depth: int):
         """
-        Crawl a single page and extract endpoints
+        Schedule a page once (dedup + depth/page limits checked before any work)
         """
         # Check depth limit
         if depth > self.config.max_depth:
             logger.debug(f"Skipping {url} (max depth {self.config.max_depth} reached)")
             return
         
-        # Check if already visited
+        # Check if already visited (or queued)
         if url in self.visited_urls:
             return
         
         # Check page limit
         if len(self.visited_urls) >= self.config.max_pages:
-            logger.info(f"Reached max pages limit ({self.config.max_pages})")
+            logger.debug(f"Reached max pages limit ({self.config.max_pages}), skipping {url}")
             return
         
         self.visited_urls.add(url)
-        logger.info(f"Crawling: {url} (depth={depth})")
+        queue.put_nowait((url, depth))
+    
+    async def _worker(self, queue: asyncio.Queue):
+        """
+        Crawl pages from the shared queue until cancelled
+        
+        Each worker owns one browser context, so recycling it (every
+        config.context_recycle_pages pages) never closes another worker's page.
+        One page (with its CDP session) is reused for successive navigations
+        and only replaced every config.page_recycle_navigations URLs, instead
+        of a new_page()/close() target attach/detach per URL. A page whose
+        renderer crashed is replaced right away and the URL it failed on is
+        queued again (once).
+        """
+        context: Optional[BrowserContext] = None
+        page: Optional[Page] = None
+        pages_since_recycle = 0
+        navigations = 0
+        recycle_every = self.config.context_recycle_pages
+        page_every = self.config.page_recycle_navigations
+        
+        try:
+            while True:
+                url, depth = await queue.get()
+                try:
+                    if context is None:
+                        context = await self._new_context()
+                    
+                    # Recycle context periodically (memory bound on long crawls)
+                    if recycle_every and pages_since_recycle >= recycle_every:
+                        context = await self._recycle_context(context)  # Closes the page too
+                        self._crashed_pages.discard(page)
+                        page = None
+                        pages_since_recycle = 0
+                    
+                    # Replace the page every K navigations (or after a crash/close)
+                    if page is not None and (
+                        page in self._crashed_pages or page.is_closed()
+                        or (page_every and navigations >= page_every)
+                    ):
+                        await self._close_page(page)
+                        page = None
+                    if page is None:
+                        page = await self._new_page(context)
+                        navigations = 0
+                    
+                    pages_since_recycle += 1
+                    navigations += 1
+                    
+                    links = await self._crawl_page(page, url, depth)
+                    
+                    # Renderer crashed during this URL: fresh page, retry the URL once
+                    if page in self._crashed_pages:
+                        await self._close_page(page)
+                        page = None
+                        if url not in self._crash_retried:
+                            self._crash_retried.add(url)
+                            logger.warning(f"Page crashed on {url}, retrying in a new page")
+                            queue.put_nowait((url, depth))  # Already in visited_urls
+                        continue
+                    
+                    for link in links:
+                        self._enqueue(queue, link, depth + 1)
+                except Exception as e:
+                    logger.error(f"Worker failed on {url}: {e}", exc_info=True)
+                finally:
+                    queue.task_done()
+        finally:
+            if context is not None:
+                await context.close()
+    
+    async def _throttle(self, url: str):
+        """
+        Space navigations to the same host by 1 / config.per_host_rate_hz seconds
+        
+        Each caller reserves the next free slot for the host before sleeping,
+        so concurrent workers queue up behind each other instead of firing
+        together. Different hosts don't wait on each other; in-page XHRs are
+        not affected.
+        """
+        rate = self.config.per_host_rate_hz
+        if not rate:
+            return
+        
+        host = urlparse(url).netloc
+        now = time.monotonic()
+        slot = max(now, self._next_nav_slot.get(host, 0.0))
+        self._next_nav_slot[host] = slot + 1 / rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+    
+    async def _new_page(self, context: BrowserContext) -> Page:
+        """
+        Open a worker page (network capture stays attached across navigations)
+        """
+        page = await context.new_page()
+        page.on('crash', self._crashed_pages.add)  # Handler receives the page
+        if self._use_cdp:
+            await self._attach_cdp_network(page)
+        return page
+    
+    async def _close_page(self, page: Page):
+        """
+        Close a worker page (also fine for a crashed renderer)
+        """
+        self._crashed_pages.discard(page)
+        await page.close()
+    
+    async def _crawl_page(self, page: Page, url: str, depth: int) -> List[str]:
+        """
+        Crawl a single URL in the worker's page and extract endpoints
         
-        # Open new page
-        page = await self.context.new_page()
+        Returns:
+            Same-origin links to crawl next (empty at max depth or on failure)
+        """
+        logger.info(f"Crawling: {url} (depth={depth})")
+        links: List[str] = []
         
         try:
-            # Navigate to URL
+            # Navigate to URL (paced per host)
+            await self._throttle(url)
             response = await page.goto(
                 url,
                 wait_until='networkidle' if self.config.wait_for_network_idle else 'domcontentloaded',
@@ -214,10 +520,10 @@ class RuntimeCrawler:
             
             if not response or response.status >= 400:
                 logger.warning(f"Page load failed: {url} (status={response.status if response else 'None'})")
-                return
+                return links
             
-            # Wait for SPA to initialize
-            await asyncio.sleep(1)  # Give JS time to execute
+            # Wait for SPA to initialize (returns as soon as the network is idle)
+            await self._wait_for_idle(page, 5000)
             
             # SCREENSHOT CAPTURE (Vision API için)
             if self.config.capture_screenshots:
@@ -230,22 +536,102 @@ class RuntimeCrawler:
             # Extract links for further crawling
             if depth < self.config.max_depth:
                 links = await self._extract_links(page, url)
-                
-                # Crawl child pages (breadth-first)
-                for link in links[:5]:  # Limit to 5 links per page to avoid explosion
-                    await self._crawl_page(link, depth + 1)
         
-        except asyncio.TimeoutError:
+        except (asyncio.TimeoutError, PlaywrightTimeoutError):
             logger.warning(f"Timeout loading {url}")
         except Exception as e:
             logger.error(f"Error crawling {url}: {e}", exc_info=True)
-        finally:
-            await page.close()
+        
+        return links
+    
+    async def _new_context(self, storage_state: Optional[Dict] = None) -> BrowserContext:
+        """
+        Create a browser context with viewport, auth and network interception
+        
+        storage_state carries cookies/localStorage over from a recycled context.
+        """
+        context = await self.browser.new_context(
+            viewport=self.config.viewport or {'width': 1920, 'height': 1080},
+            user_agent=self.config.user_agent,
+            ignore_https_errors=True,  # Allow self-signed certs in test environments
+            storage_state=storage_state
+        )
+        
+        # Set cookies (for authenticated scans) - a recycled context already has
+        # them (possibly refreshed by the site) in storage_state
+        if self.config.cookies and storage_state is None:
+            await context.add_cookies(self.config.cookies)
+            logger.info(f"Added {len(self.config.cookies)} authentication cookies")
+        
+        # Set auth header (if provided)
+        if self.config.auth_header:
+            await context.set_extra_http_headers({
+                'Authorization': self.config.auth_header
+            })
+        
+        # Register network interception
+        # Chromium: one CDP Network session per page (see _attach_cdp_network).
+        # Other browsers have no CDP -> Playwright request/response events.
+        if not self._use_cdp:
+            context.on('request', self._on_request)
+            context.on('response', self._on_response)
+            context.on('requestfailed', self._on_request_failed)
+        
+        return context
+    
+    async def _recycle_context(self, context: BrowserContext) -> BrowserContext:
+        """
+        Replace a browser context with a fresh one, keeping the session
+        
+        A long-lived context keeps growing renderer/driver memory; closing it
+        every config.context_recycle_pages pages caps RSS to one batch.
+        """
+        storage = await context.storage_state()
+        await context.close()
+        logger.info(f"Recycled browser context after {self.config.context_recycle_pages} pages")
+        return await self._new_context(storage_state=storage)
+    
+    @property
+    def _use_cdp(self) -> bool:
+        """CDP sessions are only available on Chromium"""
+        return self.config.browser_type == 'chromium'
+    
+    async def _attach_cdp_network(self, page: Page):
+        """
+        Capture network traffic for a page through a CDP Network session
+        
+        Events come straight from the DevTools protocol instead of Playwright's
+        Request/Response objects (fewer driver round-trips per request), and
+        responses are matched to requests by requestId.
+        
+        Without screenshots, images/fonts/media/CSS are blocked in the browser:
+        they are never downloaded and never reach the API filter. Blocked
+        requests still emit requestWillBeSent + loadingFailed, so the
+        resource-type filter stays.
+        """
+        cdp = await page.context.new_cdp_session(page)
+        cdp.on('Network.requestWillBeSent', self._on_cdp_request)
+        cdp.on('Network.webSocketCreated', self._on_cdp_websocket)
+        cdp.on('Network.responseReceived', self._on_cdp_response)
+        cdp.on('Network.loadingFailed', self._on_cdp_failed)
+        # Response bodies are never read -> no need for DevTools to buffer them
+        await cdp.send('Network.enable', {'maxTotalBufferSize': 0, 'maxResourceBufferSize': 0})
+        
+        if self.config.block_static_assets and not self.config.capture_screenshots:
+            blocked = _BLOCKED_STATIC_URLS if self.config.simulate_user else _BLOCKED_STATIC_AND_CSS_URLS
+            await cdp.send('Network.setBlockedURLs', {'urls': blocked})
     
     async def _capture_screenshot(self, page: Page, url: str):
         """
         Capture page screenshot for Vision API analysis
-        Converts to base64 for easy JSON serialization
+        
+        With config.screenshot_dir set, the PNG is written to
+        <screenshot_dir>/<sha256>.png and only its path is kept (identical
+        screenshots share one file). Otherwise it is inlined as base64.
+        
+        Vision "low" detail only sees a downsized image anyway, so the PNG is
+        shrunk to config.screenshot_max_size once here (if Pillow is available)
+        instead of uploading the full viewport on every analysis run.
         """
         try:
             logger.debug(f"Capturing screenshot for {url}")
@@ -256,24 +642,39 @@ class RuntimeCrawler:
                 full_page=False  # Only visible viewport (saves tokens)
             )
             
-            # Convert to base64
-            import base64
-            base64_image = base64.b64encode(screenshot_bytes).decode('utf-8')
-            
             # Get viewport size
             viewport = page.viewport_size
+            width, height = viewport['width'], viewport['height']
+            
+            # Downscale off the event loop (LANCZOS is CPU-bound)
+            max_size = self.config.screenshot_max_size
+            if Image is not None and max_size and max(width, height) > max_size:
+                screenshot_bytes, width, height = await asyncio.to_thread(
+                    _downscale_png, screenshot_bytes, max_size
+                )
             
             # Create Screenshot object
             screenshot = Screenshot(
                 url=url,
                 timestamp=datetime.utcnow().isoformat() + 'Z',
-                base64_image=base64_image,
-                width=viewport['width'],
-                height=viewport['height']
+                width=width,
+                height=height
             )
             
+            if self.config.screenshot_dir:
+                # Persist as PNG file, content-addressed
+                os.makedirs(self.config.screenshot_dir, exist_ok=True)
+                digest = hashlib.sha256(screenshot_bytes).hexdigest()[:16]
+                screenshot.path = os.path.join(self.config.screenshot_dir, f"{digest}.png")
+                if not os.path.exists(screenshot.path):
+                    with open(screenshot.path, 'wb') as f:
+                        f.write(screenshot_bytes)
+            else:
+                # Convert to base64
+                screenshot.base64_image = base64.b64encode(screenshot_bytes).decode('utf-8')
+            
             self.screenshots.append(screenshot)
-            logger.info(f"Screenshot captured: {url} ({len(base64_image)} bytes)")
+            logger.info(f"Screenshot captured: {url} ({len(screenshot_bytes)} bytes)")
             
         except Exception as e:
             logger.warning(f"Screenshot capture failed for {url}: {e}")
@@ -281,14 +682,20 @@ class RuntimeCrawler:
     async def _simulate_user_interaction(self, page: Page):
         """
         Simulate realistic user interactions to trigger lazy-loaded endpoints
+        
+        Scroll, clicks, form fills and the wait for their API calls run in ONE
+        page.evaluate (no ElementHandles, no per-element is_visible/click/fill
+        driver round-trip). Clicks are spaced clickGapMs apart inside the page.
+        The script resolves once no resource has finished for quietMs
+        (PerformanceObserver), or after maxWaitMs at the latest.
         """
         logger.debug("Simulating user interactions...")
         
-        # 1. Scroll to bottom (trigger infinite scroll, lazy images)
         try:
             await page.evaluate("""
-                () => {
-                    return new Promise((resolve) => {
+                async ({maxButtons, maxInputs, clickGapMs, quietMs, maxWaitMs}) => {
+                    // 1. Scroll to bottom (trigger infinite scroll, lazy images)
+                    await new Promise((resolve) => {
                         let totalHeight = 0;
                         const distance = 100;
                         const timer = setInterval(() => {
@@ -302,125 +709,230 @@ class RuntimeCrawler:
                             }
                         }, 100);
                     });
+                    
+                    const isVisible = (el) => {
+                        const rect = el.getBoundingClientRect();
+                        return rect.width > 0 && rect.height > 0 &&
+                            getComputedStyle(el).visibility !== 'hidden';
+                    };
+                    
+                    // 2. Click visible buttons (modals, dropdowns, etc.), one at a
+                    //    time so each handler can render before the next click
+                    const buttons = Array.from(document.querySelectorAll('button, a[role="button"], [onclick]'))
+                        .filter(isVisible)
+                        .slice(0, maxButtons);  // Limit to avoid side effects
+                    for (const el of buttons) {
+                        if (!el.isConnected) continue;  // Removed by an earlier click
+                        try { el.click(); } catch (e) {}
+                        await new Promise((resolve) => setTimeout(resolve, clickGapMs));
+                    }
+                    
+                    // 3. Fill sample form inputs (trigger autocomplete endpoints)
+                    const setValue = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+                    Array.from(document.querySelectorAll('input[type="text"], input[type="search"]'))
+                        .slice(0, maxInputs)
+                        .forEach((el) => {
+                            setValue.call(el, 'test');  // Native setter: React/Vue see the change
+                            el.dispatchEvent(new Event('input', {bubbles: true}));
+                            el.dispatchEvent(new Event('change', {bubbles: true}));
+                        });
+                    
+                    // 4. Wait for the triggered requests to settle
+                    await new Promise((resolve) => {
+                        let quiet;
+                        const done = () => {
+                            observer.disconnect();
+                            clearTimeout(quiet);
+                            clearTimeout(cap);
+                            resolve();
+                        };
+                        const observer = new PerformanceObserver(() => {
+                            clearTimeout(quiet);
+                            quiet = setTimeout(done, quietMs);
+                        });
+                        observer.observe({type: 'resource'});
+                        quiet = setTimeout(done, quietMs);
+                        const cap = setTimeout(done, maxWaitMs);
+                    });
                 }
-            """)
-            await asyncio.sleep(1)
-        except Exception as e:
-            logger.debug(f"Scroll simulation failed: {e}")
-        
-        # 2. Click visible buttons (modals, dropdowns, etc.)
-        try:
-            buttons = await page.query_selector_all('button, a[role="button"], [onclick]')
-            for button in buttons[:5]:  # Limit to first 5 to avoid side effects
-                try:
-                    if await button.is_visible():
-                        await button.click(timeout=2000)
-                        await asyncio.sleep(0.5)  # Wait for any API calls
-                except Exception:
-                    pass  # Ignore click failures (element moved, etc.)
+            """, {'maxButtons': 5, 'maxInputs': 3, 'clickGapMs': 200, 'quietMs': 500, 'maxWaitMs': 1500})
         except Exception as e:
-            logger.debug(f"Button click simulation failed: {e}")
-        
-        # 3. Fill sample form inputs (trigger autocomplete endpoints)
+            # e.g. a click navigated away and destroyed the execution context
+            logger.debug(f"User interaction simulation failed: {e}")
+    
+    async def _wait_for_idle(self, page: Page, timeout_ms: int):
+        """
+        Wait for network idle instead of a fixed sleep (busy pages just move on)
+        """
         try:
-            inputs = await page.query_selector_all('input[type="text"], input[type="search"]')
-            for input_el in inputs[:3]:
-                try:
-                    await input_el.fill('test')
-                    await asyncio.sleep(0.5)
-                except Exception:
-                    pass
-        except Exception as e:
-            logger.debug(f"Form fill simulation failed: {e}")
+            await page.wait_for_load_state('networkidle', timeout=timeout_ms)
+        except PlaywrightTimeoutError:
+            pass
     
-    async def _extract_links(self, page: Page, base_url: str) -> List[str]:
+    async def _extract_links(self, page: Page, base_url: str, limit: int = 5) -> List[str]:
         """
-        Extract all same-origin links from page
+        Extract up to `limit` unique same-origin links from page
+        
+        Filtering and the limit run inside the page: the DOM scan stops at
+        the limit and only those few strings cross the driver boundary.
+        Default limit of 5 links per page avoids crawl explosion.
         """
         try:
-            # Get all <a> tags
-            links = await page.evaluate("""
-                () => {
-                    return Array.from(document.querySelectorAll('a[href]'))
-                        .map(a => a.href)
-                        .filter(href => href.startsWith('http'));
+            return await page.evaluate("""
+                ([host, limit]) => {
+                    const links = new Set();
+                    for (const a of document.querySelectorAll('a[href]')) {
+                        const href = a.href;
+                        if (!href.startsWith('http')) continue;
+                        try {
+                            if (new URL(href).host !== host) continue;
+                        } catch (e) {
+                            continue;
+                        }
+                        links.add(href);
+                        if (links.size >= limit) break;
+                    }
+                    return Array.from(links);
                 }
-            """)
-            
-            # Filter to same-origin only
-            base_origin = urlparse(base_url).netloc
-            same_origin_links = [
-                link for link in links
-                if urlparse(link).netloc == base_origin
-            ]
-            
-            return same_origin_links
+            """, [urlparse(base_url).netloc.lower(), limit])
         except Exception as e:
             logger.debug(f"Link extraction failed: {e}")
             return []
     
+    def _record_request(self, url: str, method: str, headers: Dict[str, str],
+                        post_data: Optional[str], resource_type: str) -> NetworkRequest:
+        """
+        Store an API-like request (shared by the CDP and Playwright paths)
+        """
+        net_req = NetworkRequest(
+            url=url,
+            method=method,
+            headers=_filter_headers(headers),
+            post_data=post_data,
+            resource_type=resource_type,
+            timestamp_ns=time.time_ns(),
+            parsed=urlparse(url)
+        )
+        
+        self.network_log.append(net_req)
+        self.discovered_endpoints.add(f"{method}:{_canonical_url(net_req.parsed)}")
+        self._request_count += 1
+        
+        # First request per endpoint template survives network_log eviction
+        key = f"{method}:{_parameterize_path(net_req.parsed.path)}"
+        self._endpoint_requests.setdefault(key, net_req)
+        
+        # Full log on disk (status/response headers are not known yet at this point)
+        if self._log_file:
+            self._log_file.write(json.dumps(net_req.to_dict()) + '\n')
+        
+        logger.debug(f"[Network] {method} {url}")
+        return net_req
+    
+    def _record_response(self, net_req: NetworkRequest, status: int, headers: Dict[str, str]):
+        """
+        Attach response metadata to a captured request
+        """
+        net_req.status_code = status
+        net_req.response_headers = _filter_headers(headers)
+        # Note: response body is NOT captured to avoid memory bloat
+    
+    def _on_cdp_request(self, params: Dict):
+        """
+        Network.requestWillBeSent handler (Chromium CDP)
+        """
+        # A redirect reuses the requestId: close the previous hop first
+        redirect = params.get('redirectResponse')
+        if redirect:
+            net_req = self._pending.pop(params['requestId'], None)
+            if net_req:
+                self._record_response(net_req, redirect['status'], redirect.get('headers', {}))
+        
+        # We care about: fetch, xhr (websocket: see _on_cdp_websocket)
+        resource_type = _CDP_RESOURCE_TYPES.get(params.get('type'))
+        if resource_type is None:
+            return
+        
+        request = params['request']
+        self._pending[params['requestId']] = self._record_request(
+            request['url'], request['method'], request.get('headers', {}),
+            request.get('postData'), resource_type
+        )
+    
+    def _on_cdp_websocket(self, params: Dict):
+        """
+        Network.webSocketCreated handler (WebSocket handshakes don't emit requestWillBeSent)
+        """
+        self._record_request(params['url'], 'GET', {}, None, 'websocket')
+    
+    def _on_cdp_response(self, params: Dict):
+        """
+        Network.responseReceived handler - O(1) lookup by requestId
+        """
+        net_req = self._pending.pop(params['requestId'], None)
+        if net_req:
+            response = params['response']
+            self._record_response(net_req, response['status'], response.get('headers', {}))
+    
+    def _on_cdp_failed(self, params: Dict):
+        """
+        Network.loadingFailed handler - drop requests that will never get a response
+        """
+        self._pending.pop(params['requestId'], None)
+    
     def _on_request(self, request: Request):
         """
-        Network request interceptor (called by Playwright)
+        Network request interceptor (called by Playwright, non-Chromium browsers)
         """
         # Filter API-like requests
         resource_type = request.resource_type
         
         # We care about: fetch, xhr, websocket
-        if resource_type in ['fetch', 'xhr', 'websocket']:
+        if resource_type in _CAPTURED_RESOURCE_TYPES:
             # Try to get post_data, handle encoding errors
             try:
                 post_data = request.post_data
             except (UnicodeDecodeError, Exception):
                 post_data = None  # Binary/gzipped data
             
-            net_req = NetworkRequest(
-                url=request.url,
-                method=request.method,
-                headers=dict(request.headers),
-                post_data=post_data,
-                resource_type=resource_type,
-                timestamp=datetime.utcnow().isoformat() + 'Z'
+            self._pending[request] = self._record_request(
+                request.url, request.method, request.headers, post_data, resource_type
             )
-            
-            self.network_log.append(net_req)
-            self.discovered_endpoints.add(f"{request.method}:{request.url}")
-            
-            logger.debug(f"[Network] {request.method} {request.url}")
     
     def _on_response(self, response):
         """
-        Network response interceptor
+        Network response interceptor (called by Playwright, non-Chromium browsers)
         """
-        # Find corresponding request in log
-        for net_req in reversed(self.network_log):
-            if net_req.url == response.url and net_req.status_code is None:
-                net_req.status_code = response.status
-                net_req.response_headers = dict(response.headers)
-                # Note: response body is NOT captured to avoid memory bloat
-                break
+        # O(1) lookup of the originating request (no network_log scan)
+        net_req = self._pending.pop(response.request, None)
+        if net_req:
+            self._record_response(net_req, response.status, response.headers)
     
-    def _extract_unique_endpoints(self) -> List[Dict]:
+    def _on_request_failed(self, request: Request):
         """
-        Convert network log to endpoint records (deduped)
+        Drop failed requests from the pending map (they never get a response)
         """
-        seen = set()
-        endpoints = []
+        self._pending.pop(request, None)
+    
+    def _iter_unique_endpoints(self) -> Iterator[Dict]:
+        """
+        Yield endpoint records for captured requests (deduped), one at a time
         
-        for net_req in self.network_log:
-            # Parse URL
-            parsed = urlparse(net_req.url)
-            
-            # Parameterize path (same logic as AST extractor)
-            path_template = self._parameterize_path(parsed.path)
-            
-            # Create unique key
-            key = f"{net_req.method}:{path_template}"
-            if key in seen:
-                continue
-            seen.add(key)
+        Uses the first request per "METHOD:template" collected at capture
+        time, so endpoints evicted from the bounded network_log are kept.
+        Iterates a snapshot of the keys, so it is safe to consume while the
+        crawl is still recording requests.
+        """
+        for key, net_req in list(self._endpoint_requests.items()):
+            # Parsed once at capture time
+            parsed = net_req.parsed
+            path_template = key.split(':', 1)[1]
             
             # Build endpoint record
+            # id = sha256("METHOD:template")[:16], byte-for-byte the same as
+            # generateEndpointId() in src/core/extract.js, so runtime and AST
+            # findings for one endpoint share an id. Hashed once per unique
+            # endpoint, not per request - keep the algorithms in sync.
             endpoint = {
                 'id': hashlib.sha256(key.encode()).hexdigest()[:16],
                 'url_template': path_template,
@@ -430,7 +942,7 @@ class RuntimeCrawler:
                 'discovery_source': 'runtime_network',
                 'runtime_observed': True,
                 'runtime_observations': {
-                    'first_seen': net_req.timestamp,
+                    'first_seen': _iso_timestamp(net_req.timestamp_ns),
                     'call_count': 1,  # Will be incremented if seen again
                     'status_codes': [net_req.status_code] if net_req.status_code else [],
                     'content_types': []
@@ -439,53 +951,22 @@ class RuntimeCrawler:
                 'request_headers': net_req.headers
             }
             
-            endpoints.append(endpoint)
-        
-        return endpoints
-    
-    def _parameterize_path(self, path: str) -> str:
-        """
-        Convert /users/123/orders/456 → /users/{userId}/orders/{orderId}
-        (Same heuristic as AST extractor for consistency)
-        """
-        segments = path.split('/')
-        parameterized = []
-        
-        for i, seg in enumerate(segments):
-            if seg.isdigit():
-                # Numeric ID
-                prev_segment = segments[i-1] if i > 0 else 'item'
-                param_name = prev_segment.rstrip('s') + 'Id' if prev_segment.endswith('s') else prev_segment + 'Id'
-                parameterized.append(f"{{{param_name}}}")
-            elif len(seg) == 36 and '-' in seg:
-                # UUID pattern
-                prev_segment = segments[i-1] if i > 0 else 'item'
-                param_name = prev_segment.rstrip('s') + 'Id' if prev_segment.endswith('s') else prev_segment + 'Id'
-                parameterized.append(f"{{{param_name}}}")
-            else:
-                parameterized.append(seg)
-        
-        return '/'.join(parameterized)
+            yield endpoint
     
     def _extract_query_params(self, query_string: str) -> List[Dict]:
         """
         Extract query parameters from URL
+        
+        parse_qsl percent-decodes names, so ?user%5Fid=1 and ?user_id=1
+        yield the same parameter.
         """
         if not query_string:
             return []
         
-        params = []
-        for pair in query_string.split('&'):
-            if '=' in pair:
-                key, value = pair.split('=', 1)
-                params.append({
-                    'name': key,
-                    'location': 'query',
-                    'param_type': 'string',  # Conservative default
-                    'required': False
-                })
-        
-        return params
+        return [
+            {'name': key, **_QUERY_PARAM_DEFAULTS}
+            for key, _ in parse_qsl(query_string, keep_blank_values=True)
+        ]
 
 
 # Example usage